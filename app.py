@@ -11,20 +11,30 @@ Or set BASILICA_API_TOKEN as an environment variable.
 
 import base64
 import functools
+import hashlib
+import heapq
 import io
 import os
 import random
 import re
-import textwrap
-from concurrent.futures import ThreadPoolExecutor
+import string
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from difflib import SequenceMatcher
+from operator import itemgetter
 from pathlib import Path
 import requests as http_requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-from flask import Flask, Response, abort, jsonify, render_template_string, request
+import orjson
+from flask import Flask, abort, jsonify, make_response, redirect, request, send_file
+from flask.json.provider import JSONProvider
 from openai import OpenAI
 from PIL import Image, ImageDraw, ImageFont
+from rapidfuzz import fuzz, process
+from urllib3.util.retry import Retry
 from basilica import BasilicaClient
 
 # ---------------------------------------------------------------------------
@@ -38,6 +48,7 @@ load_dotenv()
 MODEL = "Qwen/Qwen3-0.6B"
 
 _llm = None
+_llm_lock = threading.Lock()
 
 
 def _get_llm():
@@ -50,13 +61,16 @@ def _get_llm():
     global _llm
     if _llm is not None:
         return _llm
-    client = BasilicaClient()
-    for d in client.list_deployments().deployments:
-        if d.state == "Active":
-            dep = client.get(d.instance_name)
-            _llm = OpenAI(base_url=f"{dep.url}/v1", api_key="not-needed")
-            print(f"Connected to deployment: {dep.url}")
+    with _llm_lock:  # one lookup per worker, even with many threads waiting
+        if _llm is not None:
             return _llm
+        client = BasilicaClient()
+        for d in client.list_deployments().deployments:
+            if d.state == "Active":
+                dep = client.get(d.instance_name)
+                _llm = OpenAI(base_url=f"{dep.url}/v1", api_key="not-needed")
+                print(f"Connected to deployment: {dep.url}")
+                return _llm
     raise RuntimeError(
         f"No active Basilica deployment found. "
         f"Deploy one first: basilica deploy vllm --model {MODEL}"
@@ -67,44 +81,92 @@ def _get_llm():
 # ---------------------------------------------------------------------------
 BASE_DIR = Path(__file__).parent
 
+_FACTOID_RE = re.compile(r"^\d+\.\s+(.+)")
 
-def load_factoids(path: Path) -> list[str]:
-    """Parse factoids.md — extract numbered items (e.g. '1. ...')."""
-    items = []
-    for line in path.read_text().splitlines():
-        m = re.match(r"^\d+\.\s+(.+)", line)
-        if m:
-            items.append(m.group(1).strip())
-    return items
 
+@functools.lru_cache(maxsize=4)
+def load_factoids(path: Path, mtime_ns: int | None = None) -> tuple[str, ...]:
+    """Parse factoids.md — extract numbered items (e.g. '1. ...').
 
-def load_examples(path: Path) -> dict[str, list[str]]:
-    """Parse examples.md into {technique_name: [joke, ...]}."""
+    Cached per (path, mtime_ns); pass ``path.stat().st_mtime_ns`` so edits are picked up.
+    """
+    # Stream the file rather than materializing splitlines(); immutable because
+    # lru_cache hands the same object to every caller
+    with path.open(encoding="utf-8") as f:
+        return tuple(m.group(1).strip() for m in map(_FACTOID_RE.match, f) if m)
+
+
+@functools.lru_cache(maxsize=4)
+def load_examples(path: Path, mtime_ns: int | None = None) -> dict[str, tuple[str, ...]]:
+    """Parse examples.md into {technique_name: (joke, ...)}. Cached like load_factoids."""
     sections: dict[str, list[str]] = {}
     current_section = None
-    for line in path.read_text().splitlines():
-        if line.startswith("## "):
-            current_section = line.removeprefix("## ").strip()
-            sections[current_section] = []
-        elif current_section and line.startswith("- "):
-            sections[current_section].append(line.removeprefix("- ").strip())
-    return {k: v for k, v in sections.items() if v}
-
-
-FACTOIDS = load_factoids(BASE_DIR / "factoids.md")
-EXAMPLES = load_examples(BASE_DIR / "examples.md")
-TECHNIQUES = list(EXAMPLES.keys())
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("## "):
+                current_section = line[3:].strip()
+                sections[current_section] = []
+            elif current_section and line.startswith("- "):
+                sections[current_section].append(line[2:].strip())
+    return {k: tuple(v) for k, v in sections.items() if v}
+
+
+_FACTOIDS_PATH = BASE_DIR / "factoids.md"
+_EXAMPLES_PATH = BASE_DIR / "examples.md"
+FACTOIDS = load_factoids(_FACTOIDS_PATH, _FACTOIDS_PATH.stat().st_mtime_ns)
+EXAMPLES = load_examples(_EXAMPLES_PATH, _EXAMPLES_PATH.stat().st_mtime_ns)
+TECHNIQUES = tuple(EXAMPLES.keys())
+# Every (technique, example) pair, so a prompt's style is picked with a single choice()
+_TECH_EXAMPLE_PAIRS: tuple[tuple[str, str], ...] = tuple((t, ex) for t, exs in EXAMPLES.items() for ex in exs)
 JOKES_DIR = BASE_DIR / "all-jokes"
 JOKES_DIR.mkdir(exist_ok=True)
 
+
+def _joke_shard_dir(joke_id: str) -> Path:
+    """all-jokes/YYYY/MM/ for a timestamped ID — where save_joke puts new jokes."""
+    return JOKES_DIR / joke_id[:4] / joke_id[4:6]
+
+
+def _scan_joke_files() -> dict[str, str]:
+    """Map every joke ID under JOKES_DIR to the directory holding its .md file.
+
+    New jokes are sharded into YYYY/MM/ so no one directory grows without bound; files
+    synced from GitHub (flat upstream) and older local ones sit at the top level.
+    Only digit-named subdirectories are walked, which skips e.g. the _img cache.
+    """
+    found: dict[str, str] = {}
+    years = []
+    top = str(JOKES_DIR)
+    with os.scandir(top) as it:
+        for e in it:
+            if e.name.endswith(".md"):
+                found[e.name[:-3]] = top
+            elif e.name.isdigit() and e.is_dir():
+                years.append(e.path)
+    for year in years:
+        with os.scandir(year) as it:
+            months = [e.path for e in it if e.name.isdigit() and e.is_dir()]
+        for month in months:
+            with os.scandir(month) as it:
+                found.update((e.name[:-3], month) for e in it if e.name.endswith(".md"))
+    return found
+
 GITHUB_REPO = "Bitsec-AI/jokes"
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN", "")
 SITE_URL = "https://bittensor-roast.fly.dev"
 
-_GITHUB_HEADERS = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github.v3+json",
-} if GITHUB_TOKEN else {}
+# One pooled session for every GitHub call, so TLS connections are reused
+_gh_session = http_requests.Session()
+if GITHUB_TOKEN:
+    _gh_session.headers.update({
+        "Authorization": f"token {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.v3+json",
+    })
+_gh_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+))
 
 _github_synced = False
 
@@ -117,22 +179,27 @@ def _sync_from_github():
     _github_synced = True
     try:
         url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/all-jokes"
-        resp = http_requests.get(url, headers=_GITHUB_HEADERS, timeout=15)
+        resp = _gh_session.get(url, timeout=15)
         if resp.status_code != 200:
             print(f"GitHub sync: listing failed ({resp.status_code})")
             return
-        local_names = {f.name for f in JOKES_DIR.glob("*.md")}
+        local_ids = _scan_joke_files().keys()  # includes sharded jokes, so nothing is fetched twice
         to_fetch = [f for f in resp.json()
-                     if f["name"].endswith(".md") and f["name"] not in local_names]
+                     if f["name"].endswith(".md") and f["name"][:-3] not in local_ids]
         if not to_fetch:
             return
 
         def _download(f):
             try:
-                r = http_requests.get(f["url"], headers=_GITHUB_HEADERS, timeout=10)
+                r = _gh_session.get(f["url"], timeout=10)
                 if r.status_code == 200:
                     content = base64.b64decode(r.json()["content"]).decode()
-                    (JOKES_DIR / f["name"]).write_text(content)
+                    # Temp file + rename: workers sync concurrently at import, and a
+                    # plain write_text could let another worker parse a truncated file
+                    path = JOKES_DIR / f["name"]
+                    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                    tmp_path.write_text(content)
+                    os.replace(tmp_path, path)
             except Exception:
                 pass
 
@@ -149,10 +216,13 @@ def _push_to_github(filename: str, content: str):
         return
     try:
         url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/all-jokes/{filename}"
-        http_requests.put(url, headers=_GITHUB_HEADERS, json={
+        resp = _gh_session.put(url, json={
             "message": f"Add joke {filename}",
             "content": base64.b64encode(content.encode()).decode(),
         }, timeout=15)
+        # 422 means the file already exists — that's fine
+        if resp.status_code not in (200, 201, 422):
+            print(f"GitHub push failed for {filename}: HTTP {resp.status_code}")
     except Exception as e:
         print(f"GitHub push failed for {filename}: {e}")
 
@@ -164,61 +234,154 @@ ALL_EXAMPLES: set[str] = {joke for jokes in EXAMPLES.values() for joke in jokes}
 DEDUP_THRESHOLD = 0.6
 MAX_RETRIES = 3
 
+# Lowercased examples to compare new jokes against
+_EXAMPLES_LOWER: list[str] = [ex.lower() for ex in ALL_EXAMPLES]
+
+
+# Closed blocks first (lazy, so each stops at its own </think>); the second branch only
+# wins where no </think> follows, i.e. an unclosed tail cut off by max_tokens
+_THINK_RE = re.compile(r"<think>.*?</think>\s*|<think>.*", re.DOTALL)
+
 
 def _clean_joke(raw: str) -> str:
     """Strip <think> tags (including unclosed ones) from model output."""
-    text = re.sub(r"<think>.*?</think>\s*", "", raw, flags=re.DOTALL)
-    text = re.sub(r"<think>.*", "", text, flags=re.DOTALL)
-    return text.strip().strip('"').strip()
+    if "<think>" in raw:  # with /no_think most outputs have no tag, so skip the regex
+        raw = _THINK_RE.sub("", raw)
+    return raw.strip().strip('"').strip()
 
 
 def _is_duplicate(joke: str) -> bool:
     """Check if joke is too similar to an example or a recently generated joke."""
     joke_lower = joke.lower()
-    # Check against all few-shot examples
-    for ex in ALL_EXAMPLES:
-        if SequenceMatcher(None, joke_lower, ex.lower()).ratio() > DEDUP_THRESHOLD:
-            return True
-    # Check against recently saved jokes (last 50)
-    recent = _get_jokes()[:50]
-    for prev in recent:
-        if SequenceMatcher(None, joke_lower, prev["joke"].lower()).ratio() > DEDUP_THRESHOLD:
-            return True
-    return False
+    cutoff = DEDUP_THRESHOLD * 100  # rapidfuzz scores are 0-100
+    _get_jokes()
+    # All few-shot examples + recently saved jokes (last 50), scored in one C-level pass
+    return process.extractOne(joke_lower, _dedup_candidates, scorer=fuzz.ratio, score_cutoff=cutoff) is not None
 
 # ---------------------------------------------------------------------------
 # In-memory joke index (avoids re-parsing all files on every request)
 # ---------------------------------------------------------------------------
-_joke_cache: list[dict] = []
-_joke_cache_count: int = -1  # force initial load
+_joke_cache: list[dict] = []  # newest first (filenames sort chronologically)
+_joke_by_id: dict[str, dict] = {}  # same dicts as _joke_cache, keyed by ID (file stem)
+_joke_by_style: dict[str, list[dict]] = {}  # _joke_cache bucketed by style, each newest first
+_joke_cache_lock = threading.RLock()  # gunicorn runs several request threads per worker
+# Lowercased examples + the last 50 jokes; rebuilt when the index changes
+_dedup_candidates: list[str] = list(_EXAMPLES_LOWER)
+_joke_cache_version = 0  # bumped whenever _joke_cache changes; keys the page cache
 JOKES_PER_PAGE = 20
+PARALLEL_PARSE_MIN = 64  # below this many new files, a thread pool costs more than it saves
+
+_JOKE_PREFIX = b"> "
+_STYLE_PREFIX = b"**Style:** "
+
+
+def _parse_md(data: bytes) -> tuple[str, str]:
+    """Pull (joke, style) out of a joke file in one pass; only those two lines are decoded."""
+    joke = style = b""
+    for line in data.splitlines():
+        if not joke and line.startswith(_JOKE_PREFIX):
+            joke = line[len(_JOKE_PREFIX):]
+        elif not style and line.startswith(_STYLE_PREFIX):
+            style = line[len(_STYLE_PREFIX):]
+        else:
+            continue
+        if joke and style:
+            break
+    joke_text = joke.decode("utf-8", "replace").strip()
+    return joke_text or "(parse error)", style.decode("utf-8", "replace").strip()
+
+
+def _format_time(name: str) -> str:
+    """'20260208-143022-...' -> '2026-02-08 14:30 UTC' (empty if no timestamp prefix)."""
+    if not (len(name) >= 15 and name[:8].isdigit() and name[8] == "-" and name[9:15].isdigit()):
+        return ""
+    return f"{name[:4]}-{name[4:6]}-{name[6:8]} {name[9:11]}:{name[11:13]} UTC"
 
 
 def _parse_joke_file(f: Path) -> dict:
-    text = f.read_text()
-    joke_match = re.search(r"^> (.+)$", text, re.MULTILINE)
-    style_match = re.search(r"\*\*Style:\*\* (.+)", text)
-    ts_match = re.match(r"(\d{8})-(\d{6})", f.name)
-    time_str = ""
-    if ts_match:
-        d, t = ts_match.groups()
-        time_str = f"{d[:4]}-{d[4:6]}-{d[6:]} {t[:2]}:{t[2:4]} UTC"
+    joke, style = _parse_md(f.read_bytes())
     return {
         "id": f.stem,
-        "joke": joke_match.group(1).strip() if joke_match else "(parse error)",
-        "style": style_match.group(1).strip() if style_match else "",
-        "time": time_str,
+        "joke": joke,
+        "joke_lower": joke.lower(),  # precomputed for _is_duplicate
+        "style": style,
+        "time": _format_time(f.name),
     }
 
 
+def _insert_into_cache(joke: dict) -> None:
+    """Insert a parsed joke into _joke_cache, keeping newest-first order."""
+    i = 0
+    while i < len(_joke_cache) and _joke_cache[i]["id"] > joke["id"]:
+        i += 1  # new jokes land at (or near) the head, so this is usually O(1)
+    _joke_cache.insert(i, joke)
+    _joke_by_id[joke["id"]] = joke
+
+
+def _on_cache_changed() -> None:
+    """Rebuild state derived from _joke_cache after it gains or loses jokes."""
+    global _dedup_candidates, _joke_by_style, _joke_cache_version
+    _dedup_candidates = _EXAMPLES_LOWER + [j["joke_lower"] for j in _joke_cache[:50]]
+    by_style: dict[str, list[dict]] = {}
+    for j in _joke_cache:
+        by_style.setdefault(j["style"], []).append(j)
+    _joke_by_style = by_style  # swapped in whole so readers never see a half-built index
+    _joke_cache_version += 1
+
+
+def _append_to_cache(joke: dict) -> None:
+    """Add a freshly saved joke to the index without rescanning the directory."""
+    with _joke_cache_lock:
+        if joke["id"] not in _joke_by_id:
+            _insert_into_cache(joke)
+            _on_cache_changed()
+
+
 def _get_jokes() -> list[dict]:
-    global _joke_cache, _joke_cache_count
-    _sync_from_github()
-    files = sorted(JOKES_DIR.glob("*.md"), reverse=True)
-    if len(files) != _joke_cache_count:
-        _joke_cache = [_parse_joke_file(f) for f in files]
-        _joke_cache_count = len(files)
-    return _joke_cache
+    """Return all jokes newest-first, parsing only files added since the last call."""
+    global _joke_cache
+    with _joke_cache_lock:
+        _sync_from_github()
+        # The scan yields bare names, so only files we actually parse get a Path
+        current = _scan_joke_files()
+        new_ids = current.keys() - _joke_by_id.keys()
+        removed_ids = _joke_by_id.keys() - current.keys()
+        if removed_ids:
+            _joke_cache = [j for j in _joke_cache if j["id"] not in removed_ids]
+            for joke_id in removed_ids:
+                del _joke_by_id[joke_id]
+        if new_ids:
+            paths = [Path(current[i], f"{i}.md") for i in sorted(new_ids, reverse=True)]
+            if len(paths) >= PARALLEL_PARSE_MIN:
+                # Cold boot: overlap the file reads (they release the GIL); map() keeps order
+                with ThreadPoolExecutor(max_workers=8) as pool:
+                    parsed = list(pool.map(_parse_joke_file, paths))
+            else:
+                parsed = [_parse_joke_file(p) for p in paths]
+            _joke_cache = list(heapq.merge(parsed, _joke_cache, key=itemgetter("id"), reverse=True))
+            _joke_by_id.update((j["id"], j) for j in parsed)
+        if new_ids or removed_ids:
+            _on_cache_changed()
+        return _joke_cache
+
+
+def _find_joke_file(joke_id: str) -> Path | None:
+    """Locate a joke file by ID: exact filename first, then prefix match (e.g. timestamp only).
+
+    Checks the ID's YYYY/MM shard before the flat top level.
+    """
+    dirs = [JOKES_DIR]
+    if joke_id[:6].isdigit():
+        dirs.insert(0, _joke_shard_dir(joke_id))
+    for d in dirs:
+        path = d / f"{joke_id}.md"
+        if path.is_file():
+            return path
+    for d in dirs:
+        match = next(d.glob(f"{joke_id}*.md"), None)
+        if match:
+            return match
+    return None
 
 
 # ---------------------------------------------------------------------------
@@ -226,6 +389,19 @@ def _get_jokes() -> list[dict]:
 # ---------------------------------------------------------------------------
 app = Flask(__name__)
 
+
+class ORJSONProvider(JSONProvider):
+    """Serialize jsonify() responses with orjson instead of the stdlib json module."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+app.json = ORJSONProvider(app)
+
 HTML = """
 <!DOCTYPE html>
 <html lang="en">
@@ -350,90 +526,158 @@ HTML = """
 </body>
 </html>
 """
+# The page only depends on constants, so it's rendered once rather than per request
+_INDEX_PAGE = app.jinja_env.from_string(HTML).render(model=MODEL, site_url=SITE_URL)
 
 
 @app.route("/")
 def index():
-    return render_template_string(HTML, model=MODEL, site_url=SITE_URL)
+    return _INDEX_PAGE
+
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+_SLUG_CHARS = frozenset(string.ascii_lowercase + string.digits)
+# ASCII -> itself if [a-z0-9], else "-"
+_SLUG_TABLE = str.maketrans({chr(i): chr(i) if chr(i) in _SLUG_CHARS else "-" for i in range(128)})
+
+
+def _slugify(text: str) -> str:
+    """Lowercase, map runs of anything outside [a-z0-9] to a single '-', trim the ends."""
+    text = text.lower()
+    if not text.isascii():
+        return _SLUG_RE.sub("-", text).strip("-")
+    # translate() + split/join is a C-level pass, cheaper than the regex engine
+    return "-".join(filter(None, text.translate(_SLUG_TABLE).split("-")))
 
 
 def save_joke(joke: str, factoid: str, technique: str) -> str:
-    """Save a generated joke as a markdown file in all-jokes/. Returns the filename stem (joke ID)."""
+    """Save a generated joke as a markdown file in all-jokes/YYYY/MM/. Returns the filename stem (joke ID)."""
     ts = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
-    slug = re.sub(r"[^a-z0-9]+", "-", joke[:40].lower()).strip("-")
-    filename = f"{ts}-{slug}.md"
+    stem = f"{ts}-{_slugify(joke[:40])}"
     content = (
         f"# Roast\n\n"
         f"> {joke}\n\n"
         f"**Style:** {technique}  \n"
         f"**Factoid:** {factoid}\n"
+    ).encode()
+
+    # Write under a temp name the index ignores, then hard-link it into place: link()
+    # fails instead of overwriting if another request got the same name this second,
+    # and the index never sees a half-written .md file
+    shard = _joke_shard_dir(stem)
+    shard.mkdir(parents=True, exist_ok=True)
+    tmp_path = shard / f".{stem}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, content)
+    finally:
+        os.close(fd)
+    try:
+        n = 1
+        while True:
+            path = shard / (f"{stem}.md" if n == 1 else f"{stem}-{n}.md")
+            try:
+                os.link(tmp_path, path)
+                break
+            except FileExistsError:
+                n += 1
+    finally:
+        tmp_path.unlink()
+    _append_to_cache(_parse_joke_file(path))
+    return path.stem
+
+
+# Must match gunicorn's --threads in the Dockerfile
+REQUEST_THREADS = 16
+# Candidate generations run here so one request's attempts overlap on vLLM. Sized for
+# every request thread's full set of attempts: losing attempts keep running, and a
+# smaller pool would queue new requests behind them
+_llm_pool = ThreadPoolExecutor(max_workers=REQUEST_THREADS * MAX_RETRIES)
+_rng = random.Random()  # prompt-material picks; bound methods skip the module-level lookup
+
+
+# Byte-identical on every call so vLLM's prefix cache can reuse its KV blocks;
+# everything that varies per request goes in the user message.
+SYSTEM_PROMPT = (
+    "You write short, original roast jokes about the Bittensor (TAO) crypto ecosystem.\n\n"
+    "Each request gives you a comedy style, one example of that style, and a fact.\n\n"
+    "Rules:\n"
+    "- Write ONE new joke in the given style. Just the joke text, nothing else.\n"
+    "- DO NOT copy or paraphrase the example — write something completely new.\n"
+    "- Your joke MUST be original. Do NOT reuse phrases or structure from the example.\n"
+    "- Use the fact as inspiration, but transform it into humor — don't just restate it.\n\n"
+    "/no_think"
+)
+
+
+def _generate_candidate(llm: OpenAI, factoid: str, technique: str, example: str) -> str:
+    """Ask the model for one joke in the given style about the given factoid."""
+    user_prompt = (
+        f"Style: {technique}\n"
+        f"Example: {example}\n"
+        f"Fact: {factoid}\n\n"
+        f"Write ONE original roast joke."
     )
-    (JOKES_DIR / filename).write_text(content)
-    return Path(filename).stem
+
+    response = llm.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=0.9,
+        top_p=0.95,
+        max_tokens=150,
+    )
+    return _clean_joke(response.choices[0].message.content)
 
 
 @app.route("/api/joke")
 def api_joke():
+    global _llm
     try:
         llm = _get_llm()
     except RuntimeError as e:
         return jsonify(joke="No AI model is running right now. Try again in a few minutes!", error=str(e)), 503
 
-    joke = ""
-    factoid = ""
-    technique = ""
-
-    for attempt in range(MAX_RETRIES):
-        # 1. Pick a random factoid as the topic
-        factoid = random.choice(FACTOIDS)
-
-        # 2. Pick a random comedy technique and ONE example
-        technique = random.choice(TECHNIQUES)
-        example = random.choice(EXAMPLES[technique])
-
-        system_prompt = (
-            f"You write short, original roast jokes about the Bittensor (TAO) crypto ecosystem.\n\n"
-            f"Your comedy style: {technique}\n\n"
-            f"Here is one example of the style (DO NOT copy or paraphrase this — write something completely new):\n"
-            f"- {example}\n\n"
-            f"Rules:\n"
-            f"- Write ONE new joke. Just the joke text, nothing else.\n"
-            f"- Your joke MUST be original. Do NOT reuse phrases or structure from the example.\n"
-            f"- Use the factoid below as inspiration, but transform it into humor — don't just restate it.\n\n"
-            f"/no_think"
-        )
-
-        user_prompt = f"Write a roast joke using this fact: {factoid}"
-
+    # Fire all attempts at once and take the first that comes back original — a dupe no
+    # longer costs a full extra round-trip. The attempts share one technique + example, so
+    # their prompts are identical up to the closing "Fact:" line and vLLM's prefix cache
+    # covers the style and example too; only the factoid varies per attempt.
+    technique, example = _rng.choice(_TECH_EXAMPLE_PAIRS)
+    futures = {}
+    for factoid in _rng.sample(FACTOIDS, min(MAX_RETRIES, len(FACTOIDS))):
+        future = _llm_pool.submit(_generate_candidate, llm, factoid, technique, example)
+        futures[future] = (factoid, technique)
+
+    chosen = None  # (joke, factoid, technique)
+    fallback = None  # first dupe — better than nothing
+    error = None
+    for future in as_completed(futures):
         try:
-            response = llm.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.9,
-                top_p=0.95,
-                max_tokens=150,
-            )
+            joke = future.result()
         except Exception as e:
-            # LLM call failed — reset cached client so next request retries
-            global _llm
-            _llm = None
-            print(f"LLM inference error: {e}")
-            return jsonify(joke="The AI is having a moment. Try again!", error=str(e)), 502
-
-        joke = _clean_joke(response.choices[0].message.content)
-
+            error = e
+            continue
         if not joke or len(joke) < 20:
-            continue  # too short / empty — retry
+            continue  # too short / empty
         if not _is_duplicate(joke):
-            break  # original enough — use it
-    # else: use the last attempt even if it's a dupe (better than nothing)
-
-    if not joke or len(joke) < 20:
+            chosen = (joke, *futures[future])  # original enough — use it
+            break
+        fallback = fallback or (joke, *futures[future])
+    for future in futures:
+        future.cancel()  # best-effort: drops attempts that haven't started yet
+    chosen = chosen or fallback
+
+    if chosen is None and error is not None:
+        # Every LLM call failed — reset cached client so next request retries
+        _llm = None
+        print(f"LLM inference error: {error}")
+        return jsonify(joke="The AI is having a moment. Try again!", error=str(error)), 502
+    if chosen is None:
         return jsonify(joke="The AI drew a blank. Hit the button again!", error="empty_response"), 200
 
+    joke, factoid, technique = chosen
     joke_id = save_joke(joke, factoid, technique)
     resp = jsonify(joke=joke, id=joke_id)
     resp.headers["Cache-Control"] = "no-store"
@@ -444,42 +688,78 @@ def api_joke():
 # Joke loading helper (local filesystem + GitHub API fallback)
 # ---------------------------------------------------------------------------
 
-def _load_joke(joke_id: str) -> dict | None:
-    """Find a joke by ID. Checks local files first, falls back to GitHub API."""
-    # Local: glob for files starting with the ID
-    matches = list(JOKES_DIR.glob(f"{joke_id}*.md"))
-    if matches:
-        return _parse_joke_file(matches[0])
+_REMOTE_MISS_TTL = 600  # seconds a GitHub 404 is remembered before retrying
+_REMOTE_MISS_MAX = 4096
+_remote_misses: dict[str, float] = {}  # joke ID -> monotonic time the miss expires
 
-    # Fallback: fetch from GitHub API
-    if not GITHUB_TOKEN:
-        return None
-    # Try exact filename (ID + .md)
+
+def _is_recent_id(joke_id: str) -> bool:
+    """True if the ID's timestamp prefix is within _REMOTE_MISS_TTL of now.
+
+    /api/share returns 202 before its GitHub PUT lands, so a 404 for a just-created
+    joke is expected to turn into a hit moments later and must not be remembered.
+    """
+    try:
+        ts = datetime.strptime(joke_id[:15], "%Y%m%d-%H%M%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return False
+    return (datetime.now(timezone.utc) - ts).total_seconds() < _REMOTE_MISS_TTL
+
+
+@functools.lru_cache(maxsize=1024)
+def _load_joke_remote(joke_id: str) -> dict:
+    """Fetch a joke from the GitHub API. Raises LookupError(status) if it isn't there.
+
+    Hits are cached for the life of the process (joke files are write-once); a raise
+    is never cached, so misses go through _remote_misses instead.
+    """
     url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/all-jokes/{joke_id}.md"
-    resp = http_requests.get(url, headers={
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json",
-    }, timeout=10)
+    resp = _gh_session.get(url, timeout=10)
     if resp.status_code != 200:
+        raise LookupError(resp.status_code)
+    joke, style = _parse_md(base64.b64decode(resp.json()["content"]))
+    return {"joke": joke, "style": style, "time": _format_time(joke_id)}
+
+
+def _load_joke(joke_id: str) -> dict | None:
+    """Find a joke by ID. Checks local files first, falls back to GitHub API."""
+    # Local: already-indexed jokes are a dict lookup; otherwise find the file
+    if joke_id in _joke_by_id:
+        return _joke_by_id[joke_id]
+    path = _find_joke_file(joke_id)
+    if path:
+        return _parse_joke_file(path)
+
+    # Fallback: fetch from GitHub API, unless it recently said the file doesn't exist
+    if not GITHUB_TOKEN or _remote_misses.get(joke_id, 0) > time.monotonic():
         return None
-    content = base64.b64decode(resp.json()["content"]).decode()
-    joke_match = re.search(r"^> (.+)$", content, re.MULTILINE)
-    style_match = re.search(r"\*\*Style:\*\* (.+)", content)
-    ts_match = re.match(r"(\d{8})-(\d{6})", joke_id)
-    time_str = ""
-    if ts_match:
-        d, t = ts_match.groups()
-        time_str = f"{d[:4]}-{d[4:6]}-{d[6:]} {t[:2]}:{t[2:4]} UTC"
-    return {
-        "joke": joke_match.group(1).strip() if joke_match else "(parse error)",
-        "style": style_match.group(1).strip() if style_match else "",
-        "time": time_str,
-    }
+    try:
+        return _load_joke_remote(joke_id)
+    except LookupError as e:
+        if e.args[0] == 404 and not _is_recent_id(joke_id):
+            if len(_remote_misses) >= _REMOTE_MISS_MAX:
+                _remote_misses.clear()  # crawlers probing random IDs can't grow this unbounded
+            _remote_misses[joke_id] = time.monotonic() + _REMOTE_MISS_TTL
+    except Exception as e:
+        print(f"GitHub fetch failed for {joke_id}: {e}")
+    return None
 
 
 # ---------------------------------------------------------------------------
 # Share endpoint: commit joke file to GitHub
 # ---------------------------------------------------------------------------
+_share_pool = ThreadPoolExecutor(max_workers=4)
+_shares_in_flight: set[str] = set()  # filenames queued or mid-PUT (dedupes double-clicks)
+_shares_lock = threading.Lock()
+
+
+def _share_in_background(filepath: Path):
+    try:
+        _push_to_github(filepath.name, filepath.read_text())
+    finally:
+        with _shares_lock:
+            _shares_in_flight.discard(filepath.name)
+
 
 @app.route("/api/share/<joke_id>", methods=["POST"])
 def api_share(joke_id: str):
@@ -487,29 +767,18 @@ def api_share(joke_id: str):
         return jsonify(ok=False, error="GITHUB_TOKEN not configured"), 500
 
     # Find the local file
-    matches = list(JOKES_DIR.glob(f"{joke_id}*.md"))
-    if not matches:
+    filepath = _find_joke_file(joke_id)
+    if not filepath:
         return jsonify(ok=False, error="Joke not found"), 404
 
-    filepath = matches[0]
-    content_b64 = base64.b64encode(filepath.read_bytes()).decode()
-
-    # PUT to GitHub Contents API
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/all-jokes/{filepath.name}"
-    resp = http_requests.put(url, headers={
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json",
-    }, json={
-        "message": f"Add joke {filepath.name}",
-        "content": content_b64,
-    }, timeout=15)
-
-    if resp.status_code in (200, 201):
-        return jsonify(ok=True, url=f"{SITE_URL}/joke/{joke_id}")
-    if resp.status_code == 422:
-        # Already exists — that's fine
-        return jsonify(ok=True, url=f"{SITE_URL}/joke/{joke_id}")
-    return jsonify(ok=False, error=f"GitHub API error {resp.status_code}"), 502
+    # PUT to GitHub in the background — the client treats sharing as best-effort,
+    # so don't hold a worker for the GitHub round-trip
+    with _shares_lock:
+        already_queued = filepath.name in _shares_in_flight
+        _shares_in_flight.add(filepath.name)
+    if not already_queued:
+        _share_pool.submit(_share_in_background, filepath)
+    return jsonify(ok=True, queued=True, url=f"{SITE_URL}/joke/{joke_id}"), 202
 
 
 # ---------------------------------------------------------------------------
@@ -628,6 +897,7 @@ JOKE_PAGE_HTML = """
 </body>
 </html>
 """
+_JOKE_PAGE_TPL = app.jinja_env.from_string(JOKE_PAGE_HTML)  # compiled once at import
 
 
 @app.route("/joke/<joke_id>")
@@ -635,8 +905,7 @@ def joke_permalink(joke_id: str):
     data = _load_joke(joke_id)
     if not data:
         abort(404)
-    return render_template_string(
-        JOKE_PAGE_HTML,
+    return _JOKE_PAGE_TPL.render(
         joke=data["joke"],
         style=data["style"],
         time=data["time"],
@@ -649,10 +918,19 @@ def joke_permalink(joke_id: str):
 # OG image generation (Pillow)
 # ---------------------------------------------------------------------------
 
-@functools.lru_cache(maxsize=256)
-def _render_joke_image(joke_text: str) -> bytes:
-    """Render a joke as a branded PNG. Cached in memory (up to 256 images)."""
-    W, H = 1200, 630
+OG_WIDTH, OG_HEIGHT = 1200, 630
+OG_CACHE_DIR = JOKES_DIR / "_img"
+_OG_FONT_BODY = ImageFont.load_default(size=34)  # loaded once; only the joke text is measured per render
+_OG_TEXT_X = 120
+_OG_TEXT_MAX_PX = OG_WIDTH - 2 * _OG_TEXT_X
+_OG_LINE_SPACING = 4  # Pillow's multiline_text default
+_OG_LINE_H = _OG_FONT_BODY.getbbox("A")[3] + _OG_LINE_SPACING  # how multiline_text advances lines
+_OG_SPACE_PX = _OG_FONT_BODY.getlength(" ")
+
+
+def _build_og_template() -> Image.Image:
+    """Render the joke-independent parts of the OG image once at import."""
+    W, H = OG_WIDTH, OG_HEIGHT
     img = Image.new("RGB", (W, H), "#0f0f1a")
     draw = ImageDraw.Draw(img)
 
@@ -668,7 +946,6 @@ def _render_joke_image(joke_text: str) -> bytes:
     draw.rectangle([(0, 0), (W, 4)], fill="#f57c20")
 
     font_title = ImageFont.load_default(size=42)
-    font_body = ImageFont.load_default(size=34)
     font_quote = ImageFont.load_default(size=120)
 
     # Big decorative quote mark in orange
@@ -678,26 +955,98 @@ def _render_joke_image(joke_text: str) -> bytes:
     title = "Bittensor Roast Machine"
     bbox = draw.textbbox((0, 0), title, font=font_title)
     draw.text(((W - bbox[2]) / 2, 36), title, fill="#f57c20", font=font_title)
+    return img
+
+
+_OG_TEMPLATE = _build_og_template()
+
+
+def _split_wide_words(words: list[str]):
+    """Hard-break any word wider than a line (e.g. a wallet address) into line-sized chunks."""
+    for word in words:
+        if _OG_FONT_BODY.getlength(word) <= _OG_TEXT_MAX_PX:
+            yield word
+            continue
+        chunk = ""
+        for ch in word:
+            if chunk and _OG_FONT_BODY.getlength(chunk + ch) > _OG_TEXT_MAX_PX:
+                yield chunk
+                chunk = ""
+            chunk += ch
+        if chunk:
+            yield chunk
+
+
+def _wrap_px(text: str) -> list[str]:
+    """Greedy word wrap on rendered width in the body font, rather than character count."""
+    lines: list[str] = []
+    line: list[str] = []
+    line_w = 0.0
+    for word in _split_wide_words(text.split()):
+        word_w = _OG_FONT_BODY.getlength(word)
+        if line and line_w + _OG_SPACE_PX + word_w > _OG_TEXT_MAX_PX:
+            lines.append(" ".join(line))
+            line, line_w = [word], word_w
+        else:
+            line_w += _OG_SPACE_PX + word_w if line else word_w
+            line.append(word)
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+
+def _render_joke_image(joke_text: str) -> bytes:
+    """Stamp a joke onto the OG template as a PNG."""
+    img = _OG_TEMPLATE.copy()
+    draw = ImageDraw.Draw(img)
 
     # Joke text — white, word-wrapped and vertically centered
-    wrapped = textwrap.fill(joke_text, width=42)
-    bbox = draw.textbbox((0, 0), wrapped, font=font_body)
-    text_h = bbox[3] - bbox[1]
-    y_start = max(140, (H - text_h) / 2 - 10)
-    draw.text((120, y_start), wrapped, fill="white", font=font_body)
+    lines = _wrap_px(joke_text)
+    text_h = len(lines) * _OG_LINE_H - _OG_LINE_SPACING
+    y_start = max(140, (OG_HEIGHT - text_h) / 2 - 10)
+    draw.multiline_text((_OG_TEXT_X, y_start), "\n".join(lines), fill="white",
+                        font=_OG_FONT_BODY, spacing=_OG_LINE_SPACING)
 
     buf = io.BytesIO()
-    img.save(buf, format="PNG")
+    # zlib level 1: several times faster than the default 6, for a modestly larger file
+    img.save(buf, format="PNG", compress_level=1, optimize=False)
     return buf.getvalue()
 
 
+_JOKE_ID_RE = re.compile(r"[0-9a-z-]+")  # everything save_joke can produce
+
+
 @app.route("/joke/<joke_id>/image")
 def joke_image(joke_id: str):
-    data = _load_joke(joke_id)
-    if not data:
+    if not _JOKE_ID_RE.fullmatch(joke_id):
         abort(404)
-    png = _render_joke_image(data["joke"])
-    return Response(png, mimetype="image/png", headers={"Cache-Control": "public, max-age=86400"})
+    # Rendered PNGs are cached on disk so repeat hits (and restarts) skip Pillow
+    img_path = OG_CACHE_DIR / f"{joke_id}.png"
+    if not img_path.exists():
+        path = None if joke_id in _joke_by_id else _find_joke_file(joke_id)
+        if path is not None and path.stem != joke_id:
+            # Prefix match: point at the canonical ID so only real IDs ever get a cache
+            # file — otherwise every distinct prefix would write its own PNG
+            return redirect(f"/joke/{path.stem}/image", 301)
+        data = _load_joke(joke_id)
+        if not data:
+            abort(404)
+        png = _render_joke_image(data["joke"])
+        if joke_id not in _joke_by_id and path is None:
+            # Only on GitHub, not on local disk: serve without writing a cache file
+            resp = send_file(io.BytesIO(png), mimetype="image/png", max_age=31536000)
+            resp.cache_control.immutable = True
+            return resp
+        OG_CACHE_DIR.mkdir(exist_ok=True)
+        # Write to a per-thread temp file and rename, so a concurrent request never
+        # serves a half-written PNG
+        tmp_path = img_path.with_name(f".{img_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(png)
+        os.replace(tmp_path, img_path)
+    # Joke files are write-once, so an ID's image never changes
+    resp = send_file(img_path, mimetype="image/png", max_age=31536000)
+    resp.cache_control.immutable = True
+    return resp
 
 
 ALL_JOKES_HTML = """
@@ -824,16 +1173,26 @@ ALL_JOKES_HTML = """
 </body>
 </html>
 """
+_ALL_JOKES_TPL = app.jinja_env.from_string(ALL_JOKES_HTML)  # compiled once at import
+
+
+# Rendered /all-jokes pages, keyed on (style_filter, page, _joke_cache_version)
+_page_cache: OrderedDict[tuple[str, int, int], tuple[str, str]] = OrderedDict()  # -> (html, etag)
+_page_cache_lock = threading.Lock()
+PAGE_CACHE_SIZE = 128
 
 
 @app.route("/all-jokes")
 def all_jokes():
-    all_items = _get_jokes()
+    with _joke_cache_lock:  # read the list, its style index and its version together
+        all_items = _get_jokes()
+        by_style = _joke_by_style
+        version = _joke_cache_version
 
     # --- Filtering ---
     style_filter = request.args.get("style", "").strip()
     if style_filter and style_filter in TECHNIQUES:
-        filtered = [j for j in all_items if j["style"] == style_filter]
+        filtered = by_style.get(style_filter, [])
     else:
         style_filter = ""
         filtered = all_items
@@ -848,23 +1207,48 @@ def all_jokes():
     total_pages = max(1, (total + JOKES_PER_PAGE - 1) // JOKES_PER_PAGE)
     page = min(page, total_pages)
 
-    start = (page - 1) * JOKES_PER_PAGE
-    page_jokes = filtered[start : start + JOKES_PER_PAGE]
-
-    return render_template_string(
-        ALL_JOKES_HTML,
-        jokes=page_jokes,
-        count=total,
-        total_all=len(all_items),
-        page=page,
-        total_pages=total_pages,
-        style_filter=style_filter,
-        techniques=TECHNIQUES,
-        site_url=SITE_URL,
-    )
+    key = (style_filter, page, version)
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is not None:
+            _page_cache.move_to_end(key)
+
+    if entry is None:
+        start = (page - 1) * JOKES_PER_PAGE
+        page_jokes = filtered[start : start + JOKES_PER_PAGE]
+
+        html = _ALL_JOKES_TPL.render(
+            jokes=page_jokes,
+            count=total,
+            total_all=len(all_items),
+            page=page,
+            total_pages=total_pages,
+            style_filter=style_filter,
+            techniques=TECHNIQUES,
+            site_url=SITE_URL,
+        )
+        # Hash the page itself rather than the cache version, which is per-process —
+        # this way every gunicorn worker hands out the same ETag for the same page
+        entry = (html, hashlib.blake2b(html.encode(), digest_size=12).hexdigest())
+        with _page_cache_lock:
+            _page_cache[key] = entry
+            if len(_page_cache) > PAGE_CACHE_SIZE:
+                _page_cache.popitem(last=False)  # evict least recently used
+
+    html, etag = entry
+    resp = make_response(html)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "public, max-age=60"
+    return resp.make_conditional(request)  # 304 with no body if If-None-Match matches
+
+# Build the joke index (and run the one-time GitHub sync) at startup instead of on the
+# first request. It runs in the background so boot isn't held up; a request arriving
+# before it finishes just waits on _joke_cache_lock.
+threading.Thread(target=_get_jokes, name="joke-index-warmup", daemon=True).start()
 
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
+    # Local dev only — production runs under gunicorn with threaded workers (see Dockerfile)
     print(f"\n  Open http://localhost:{port} in your browser\n")
-    app.run(host="0.0.0.0", port=port)
+    app.run(host="0.0.0.0", port=port, threaded=True)
@@ -1,21 +1,25 @@
 #!/usr/bin/env python3
-"""Basilica login script — replicates `basilica login` and `basilica login --device-code`."""
+"""Basilica login script — replicates `basilica login` and `basilica login --device-code`.
+
+Not stdlib-only: HTTP goes through urllib3 (pinned in requirements.txt).
+"""
 
 import argparse
-import http.server
 import json
 import os
 import secrets
+import socket
 import sys
 import threading
 import time
 import urllib.parse
-import urllib.request
 import webbrowser
 from hashlib import sha256
-from base64 import urlsafe_b64encode
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from pathlib import Path
 
+import urllib3
+
 AUTH0_DOMAIN = os.environ.get(
     "BASILICA_AUTH0_DOMAIN", "auth.basilica.ai"
 )
@@ -36,38 +40,149 @@ AUTH_FILE = AUTH_DIR / "auth.json"
 REDIRECT_PORT = 8249
 REDIRECT_URI = f"http://localhost:{REDIRECT_PORT}/callback"
 
+# One keep-alive pool for every call, so device-code polling reuses a single TLS
+# connection instead of handshaking on each attempt
+_HTTP = urllib3.PoolManager(maxsize=4, retries=False)
+_FORM_HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded",
+    "User-Agent": "basilica-login",
+}
+
+
+class HTTPStatusError(Exception):
+    """Non-2xx/3xx response from Auth0 or the Basilica API."""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body}")
+        self.status = status
+        self.body = body
+
+
+# Refresh this many seconds before the access token actually expires
+TOKEN_EXPIRY_MARGIN = 60
+
+
+def _jwt_exp(token: str) -> float | None:
+    """Read the `exp` claim from a JWT without verifying it (None if it isn't a JWT)."""
+    try:
+        payload = token.split(".")[1]
+        return float(json.loads(urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+_auth_cache: tuple[int, dict] | None = None  # (st_mtime_ns, parsed auth.json)
+
+
+def _load_auth() -> dict | None:
+    """Parsed auth.json (None if absent), re-read only when the file's mtime changes."""
+    global _auth_cache
+    try:
+        mtime_ns = AUTH_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        _auth_cache = None
+        return None
+    if _auth_cache is None or _auth_cache[0] != mtime_ns:
+        _auth_cache = (mtime_ns, json.loads(AUTH_FILE.read_text()))
+    return _auth_cache[1]
+
 
 def save_tokens(token_data: dict) -> None:
+    global _auth_cache
+    # Record when the access token dies so _get_access_token can skip needless refreshes
+    expires_at = _jwt_exp(token_data.get("access_token", ""))
+    if expires_at is None and "expires_in" in token_data:
+        expires_at = time.time() + token_data["expires_in"]
+    if expires_at is not None:
+        token_data["expires_at"] = int(expires_at)
+    try:
+        unchanged = _load_auth() == token_data
+    except (OSError, ValueError):
+        unchanged = False  # unreadable or torn auth.json — overwrite it
+    if unchanged:
+        return  # e.g. a refresh that handed back the same tokens — nothing to rewrite
     AUTH_DIR.mkdir(parents=True, exist_ok=True)
-    AUTH_FILE.write_text(json.dumps(token_data, indent=2))
-    AUTH_FILE.chmod(0o600)
+    # Write a 0600 temp file and rename it over auth.json: the mode is set at create
+    # time (no window where tokens are world-readable) and a crash mid-write can't
+    # leave a torn auth.json behind
+    tmp = AUTH_FILE.with_name(f".{AUTH_FILE.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(token_data, f, indent=2)
+    os.replace(tmp, AUTH_FILE)
+    _auth_cache = (AUTH_FILE.stat().st_mtime_ns, token_data)  # we just wrote it; no re-read
     print(f"Credentials saved to {AUTH_FILE}")
 
 
 def _post(url: str, data: dict) -> dict:
-    body = urllib.parse.urlencode(data).encode()
-    req = urllib.request.Request(
-        url, data=body, headers={"Content-Type": "application/x-www-form-urlencoded"}
-    )
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return json.loads(resp.read())
-    except urllib.error.HTTPError as e:
-        err_body = e.read().decode()
-        print(f"HTTP {e.code}: {err_body}", file=sys.stderr)
-        raise
+    resp = _HTTP.request("POST", url, body=urllib.parse.urlencode(data), headers=_FORM_HEADERS)
+    if resp.status >= 400:
+        err_body = resp.data.decode()
+        print(f"HTTP {resp.status}: {err_body}", file=sys.stderr)
+        raise HTTPStatusError(resp.status, err_body)
+    return json.loads(resp.data)
 
 
 # ── Browser-based PKCE login ──────────────────────────────────────────────
 
+_CALLBACK_OK_HTML = b"<html><body><h2>Login successful! You can close this tab.</h2></body></html>"
 
-def login_browser() -> None:
+
+def _http_response(status: str, body: bytes, content_type: str) -> bytes:
+    return (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n"
+    ).encode() + body
+
+
+def _accept_callback(server: socket.socket, state: str) -> dict:
+    """Answer the single OAuth redirect on `server`; returns {"code": ...}, {"error": ...} or {}.
+
+    Only the request line is needed, so this reads it straight off the socket rather
+    than standing up http.server for one GET.
+    """
+    try:
+        conn, _ = server.accept()
+    except TimeoutError:
+        return {}
+    with conn:
+        conn.settimeout(10)
+        data = b""
+        try:
+            while b"\r\n" not in data and len(data) < 16384:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+        except OSError:  # includes TimeoutError, e.g. a browser preconnect that never sends
+            return {}
+        # Request line: "GET /callback?code=...&state=... HTTP/1.1"
+        parts = data.split(b"\r\n", 1)[0].decode("latin-1").split(" ")
+        target = parts[1] if len(parts) > 1 else ""
+        qs = urllib.parse.parse_qs(urllib.parse.urlparse(target).query)
+        if qs.get("state", [None])[0] != state:
+            conn.sendall(_http_response("400 Bad Request", b"State mismatch", "text/plain"))
+            return {}
+        conn.sendall(_http_response("200 OK", _CALLBACK_OK_HTML, "text/html"))
+    if "error" in qs:
+        return {"error": qs["error"][0]}
+    if "code" in qs:
+        return {"code": qs["code"][0]}
+    return {}
+
+
+def _pkce_pair() -> tuple[str, str]:
+    """Return a fresh (code_verifier, S256 code_challenge) pair."""
     code_verifier = secrets.token_urlsafe(64)
-    code_challenge = (
-        urlsafe_b64encode(sha256(code_verifier.encode()).digest())
-        .rstrip(b"=")
-        .decode()
-    )
+    code_challenge = urlsafe_b64encode(sha256(code_verifier.encode()).digest()).rstrip(b"=").decode()
+    return code_verifier, code_challenge
+
+
+def login_browser() -> None:
+    code_verifier, code_challenge = _pkce_pair()
     state = secrets.token_urlsafe(32)
 
     params = urllib.parse.urlencode(
@@ -84,38 +199,16 @@ def login_browser() -> None:
     )
     auth_url = f"{AUTHORIZE_URL}?{params}"
 
-    result = {}
-
-    class CallbackHandler(http.server.BaseHTTPRequestHandler):
-        def do_GET(self):
-            qs = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
-            if qs.get("state", [None])[0] != state:
-                self.send_response(400)
-                self.end_headers()
-                self.wfile.write(b"State mismatch")
-                return
-            if "error" in qs:
-                result["error"] = qs["error"][0]
-            else:
-                result["code"] = qs["code"][0]
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html")
-            self.end_headers()
-            self.wfile.write(
-                b"<html><body><h2>Login successful! You can close this tab.</h2></body></html>"
-            )
-
-        def log_message(self, *_):
-            pass
-
-    server = http.server.HTTPServer(("127.0.0.1", REDIRECT_PORT), CallbackHandler)
-    server.timeout = 120
+    # Bind before opening the browser so the redirect can't beat the listener
+    with socket.create_server(("127.0.0.1", REDIRECT_PORT)) as server:
+        server.settimeout(120)
 
-    print("Opening browser for login...")
-    webbrowser.open(auth_url)
+        # Launch the browser off-thread so we're already in accept() when the redirect
+        # lands; webbrowser.open can block (e.g. a terminal browser runs until it exits)
+        print("Opening browser for login...")
+        threading.Thread(target=webbrowser.open, args=(auth_url,), daemon=True).start()
 
-    server.handle_request()
-    server.server_close()
+        result = _accept_callback(server, state)
 
     if "error" in result:
         print(f"Auth error: {result['error']}", file=sys.stderr)
@@ -157,43 +250,43 @@ def login_device_code() -> None:
 
     device_code = resp["device_code"]
     interval = resp.get("interval", 5)
-    expires_at = time.time() + resp.get("expires_in", 900)
+    # Monotonic clock so a wall-clock jump (NTP, suspend) can't stretch or cut the window
+    deadline = time.monotonic() + resp.get("expires_in", 900)
 
-    poll_data = {
+    poll_body = urllib.parse.urlencode({
         "grant_type": "urn:ietf:params:oauth:grant-type:device_code",
         "client_id": AUTH0_CLIENT_ID,
         "device_code": device_code,
-    }
-
-    while time.time() < expires_at:
-        time.sleep(interval)
-        body = urllib.parse.urlencode(poll_data).encode()
-        req = urllib.request.Request(
-            TOKEN_URL, data=body,
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        try:
-            with urllib.request.urlopen(req) as resp:
-                token_data = json.loads(resp.read())
-            save_tokens(token_data)
+    })
+
+    # RFC 8628 §3.5 forbids polling more often than `interval`, but the interval runs
+    # between requests — so time it from each poll's start instead of adding the
+    # round-trip on top of every sleep
+    next_poll = time.monotonic() + interval
+    while next_poll < deadline:
+        time.sleep(max(0.0, next_poll - time.monotonic()))
+        next_poll = time.monotonic() + interval
+        resp = _HTTP.request("POST", TOKEN_URL, body=poll_body, headers=_FORM_HEADERS)
+        if resp.status < 400:
+            save_tokens(json.loads(resp.data))
             print("Logged in successfully.")
             return
-        except urllib.error.HTTPError as e:
-            err_body = e.read().decode()
-            try:
-                err_json = json.loads(err_body)
-            except json.JSONDecodeError:
-                print(f"HTTP {e.code}: {err_body}", file=sys.stderr)
-                sys.exit(1)
-            err = err_json.get("error")
-            if err == "authorization_pending":
-                continue
-            elif err == "slow_down":
-                interval += 5
-                continue
-            else:
-                print(f"Auth error: {err} — {err_json.get('error_description', '')}", file=sys.stderr)
-                sys.exit(1)
+        err_body = resp.data.decode()
+        try:
+            err_json = json.loads(err_body)
+        except json.JSONDecodeError:
+            print(f"HTTP {resp.status}: {err_body}", file=sys.stderr)
+            sys.exit(1)
+        err = err_json.get("error")
+        if err == "authorization_pending":
+            continue
+        elif err == "slow_down":
+            interval += 5  # applies to this wait and every later one, per the RFC
+            next_poll += 5
+            continue
+        else:
+            print(f"Auth error: {err} — {err_json.get('error_description', '')}", file=sys.stderr)
+            sys.exit(1)
 
     print("Device code expired. Please try again.", file=sys.stderr)
     sys.exit(1)
@@ -217,16 +310,19 @@ API_TOKEN_FILE = Path("basilica_api_token.json")
 
 
 def _get_access_token() -> str:
-    """Load access token from auth.json, refreshing if needed."""
-    if not AUTH_FILE.exists():
+    """Load access token from auth.json, refreshing only if it's (nearly) expired."""
+    data = _load_auth()
+    if data is None:
         print("Not logged in. Run: python basilica_login.py login", file=sys.stderr)
         sys.exit(1)
-    data = json.loads(AUTH_FILE.read_text())
     access_token = data.get("access_token")
     refresh_token = data.get("refresh_token")
     if not access_token:
         print("No access token in auth file. Please login again.", file=sys.stderr)
         sys.exit(1)
+    expires_at = data.get("expires_at")
+    if expires_at is not None and time.time() < expires_at - TOKEN_EXPIRY_MARGIN:
+        return access_token
     if refresh_token:
         try:
             refreshed = _post(
@@ -237,6 +333,8 @@ def _get_access_token() -> str:
                     "refresh_token": refresh_token,
                 },
             )
+            # Without rotation Auth0 doesn't send a new refresh token — keep the old one
+            refreshed.setdefault("refresh_token", refresh_token)
             save_tokens(refreshed)
             return refreshed["access_token"]
         except Exception:
@@ -250,34 +348,38 @@ def tokens_create(name: str | None = None) -> None:
     if not name:
         name = "cli-token"
 
-    url = f"{API_BASE}/api-keys"
-    data = json.dumps({"name": name}).encode()
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Content-Type", "application/json")
-    try:
-        with urllib.request.urlopen(req) as resp:
-            result = json.loads(resp.read())
-            API_TOKEN_FILE.write_text(json.dumps(result, indent=2))
-            API_TOKEN_FILE.chmod(0o600)
-            print(f"API token created and saved to {API_TOKEN_FILE}")
-            print("IMPORTANT: Keep this file safe. The token won't be shown again.")
-    except urllib.error.HTTPError as e:
-        err_body = e.read().decode()
-        print(f"API error ({e.code}): {err_body}", file=sys.stderr)
+    resp = _HTTP.request(
+        "POST",
+        f"{API_BASE}/api-keys",
+        body=json.dumps({"name": name}),
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "User-Agent": _FORM_HEADERS["User-Agent"],
+        },
+    )
+    if resp.status >= 400:
+        print(f"API error ({resp.status}): {resp.data.decode()}", file=sys.stderr)
         sys.exit(1)
+    result = json.loads(resp.data)
+    API_TOKEN_FILE.write_text(json.dumps(result, indent=2))
+    API_TOKEN_FILE.chmod(0o600)
+    print(f"API token created and saved to {API_TOKEN_FILE}")
+    print("IMPORTANT: Keep this file safe. The token won't be shown again.")
 
 
 # ── Token management ────────────────────────────────────────────────────────
 
 
 def show_status() -> None:
-    if AUTH_FILE.exists():
-        data = json.loads(AUTH_FILE.read_text())
+    data = _load_auth()
+    if data is not None:
         print(f"Auth file: {AUTH_FILE}")
         print(f"Has access_token:  {'access_token' in data}")
         print(f"Has refresh_token: {'refresh_token' in data}")
-        if "expires_in" in data:
+        if "expires_at" in data:
+            print(f"Token expires in:  {int(data['expires_at'] - time.time())}s")
+        elif "expires_in" in data:
             print(f"Token expires_in:  {data['expires_in']}s")
     elif os.environ.get("BASILICA_API_TOKEN"):
         print("Using BASILICA_API_TOKEN environment variable.")
@@ -1,10 +1,11 @@
 """Tests for joke generation logic (no Basilica/network required)."""
 import re
+import string
 import tempfile
 from pathlib import Path
-from difflib import SequenceMatcher
 from unittest.mock import patch, MagicMock
 import pytest
+from rapidfuzz import fuzz
 
 
 # ---------------------------------------------------------------------------
@@ -12,30 +13,41 @@ import pytest
 # ---------------------------------------------------------------------------
 def _clean_joke(raw: str) -> str:
     """Strip <think> tags (including unclosed ones) from model output."""
-    text = re.sub(r"<think>.*?</think>\s*", "", raw, flags=re.DOTALL)
-    text = re.sub(r"<think>.*", "", text, flags=re.DOTALL)
-    return text.strip().strip('"').strip()
+    if "<think>" in raw:
+        raw = re.sub(r"<think>.*?</think>\s*|<think>.*", "", raw, flags=re.DOTALL)
+    return raw.strip().strip('"').strip()
 
 
-def load_factoids(path: Path) -> list[str]:
-    items = []
-    for line in path.read_text().splitlines():
-        m = re.match(r"^\d+\.\s+(.+)", line)
-        if m:
-            items.append(m.group(1).strip())
-    return items
+_FACTOID_RE = re.compile(r"^\d+\.\s+(.+)")
 
 
-def load_examples(path: Path) -> dict[str, list[str]]:
+def load_factoids(path: Path) -> tuple[str, ...]:
+    with path.open(encoding="utf-8") as f:
+        return tuple(m.group(1).strip() for m in map(_FACTOID_RE.match, f) if m)
+
+
+def load_examples(path: Path) -> dict[str, tuple[str, ...]]:
     sections: dict[str, list[str]] = {}
     current_section = None
-    for line in path.read_text().splitlines():
-        if line.startswith("## "):
-            current_section = line.removeprefix("## ").strip()
-            sections[current_section] = []
-        elif current_section and line.startswith("- "):
-            sections[current_section].append(line.removeprefix("- ").strip())
-    return {k: v for k, v in sections.items() if v}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("## "):
+                current_section = line[3:].strip()
+                sections[current_section] = []
+            elif current_section and line.startswith("- "):
+                sections[current_section].append(line[2:].strip())
+    return {k: tuple(v) for k, v in sections.items() if v}
+
+
+# Parsed once per session; any test that needs the shipped content shares these
+@pytest.fixture(scope="session")
+def real_factoids() -> tuple[str, ...]:
+    return load_factoids(Path(__file__).parent / "factoids.md")
+
+
+@pytest.fixture(scope="session")
+def real_examples() -> dict[str, tuple[str, ...]]:
+    return load_examples(Path(__file__).parent / "examples.md")
 
 
 # ---------------------------------------------------------------------------
@@ -93,23 +105,22 @@ class TestLoadFactoids:
         f = tmp_path / "facts.md"
         f.write_text("# Title\n\n1. First fact\n2. Second fact  \n3. Third fact\n")
         result = load_factoids(f)
-        assert result == ["First fact", "Second fact", "Third fact"]
+        assert result == ("First fact", "Second fact", "Third fact")
 
     def test_strips_trailing_whitespace(self, tmp_path):
         f = tmp_path / "facts.md"
         f.write_text("1. Fact with trailing spaces   \n")
         result = load_factoids(f)
-        assert result == ["Fact with trailing spaces"]
+        assert result == ("Fact with trailing spaces",)
 
     def test_skips_non_numbered_lines(self, tmp_path):
         f = tmp_path / "facts.md"
         f.write_text("# Header\nSome text\n1. Real fact\n- Bullet\n")
         result = load_factoids(f)
-        assert result == ["Real fact"]
+        assert result == ("Real fact",)
 
-    def test_handles_real_file(self):
-        base = Path(__file__).parent
-        result = load_factoids(base / "factoids.md")
+    def test_handles_real_file(self, real_factoids):
+        result = real_factoids
         assert len(result) > 100, f"Expected 100+ factoids, got {len(result)}"
         assert all(isinstance(f, str) and len(f) > 10 for f in result)
 
@@ -123,8 +134,8 @@ class TestLoadExamples:
         f.write_text("## Style A\n- Joke 1\n- Joke 2\n\n## Style B\n- Joke 3\n")
         result = load_examples(f)
         assert set(result.keys()) == {"Style A", "Style B"}
-        assert result["Style A"] == ["Joke 1", "Joke 2"]
-        assert result["Style B"] == ["Joke 3"]
+        assert result["Style A"] == ("Joke 1", "Joke 2")
+        assert result["Style B"] == ("Joke 3",)
 
     def test_skips_empty_sections(self, tmp_path):
         f = tmp_path / "ex.md"
@@ -133,9 +144,8 @@ class TestLoadExamples:
         assert "Empty" not in result
         assert "Has Jokes" in result
 
-    def test_handles_real_file(self):
-        base = Path(__file__).parent
-        result = load_examples(base / "examples.md")
+    def test_handles_real_file(self, real_examples):
+        result = real_examples
         assert len(result) == 7, f"Expected 7 techniques, got {len(result)}"
         total = sum(len(v) for v in result.values())
         assert total == 48, f"Expected 48 example jokes, got {total}"
@@ -148,7 +158,7 @@ DEDUP_THRESHOLD = 0.6
 
 
 def _is_similar(a: str, b: str) -> bool:
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio() > DEDUP_THRESHOLD
+    return fuzz.ratio(a.lower(), b.lower()) >= DEDUP_THRESHOLD * 100
 
 
 class TestDeduplication:
@@ -173,8 +183,32 @@ class TestDeduplication:
 
 
 # ---------------------------------------------------------------------------
-# Tests for save_joke (file I/O)
+# Tests for slugs and save_joke (file I/O)
 # ---------------------------------------------------------------------------
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+_SLUG_CHARS = frozenset(string.ascii_lowercase + string.digits)
+_SLUG_TABLE = str.maketrans({chr(i): chr(i) if chr(i) in _SLUG_CHARS else "-" for i in range(128)})
+
+
+def _slugify(text: str) -> str:
+    text = text.lower()
+    if not text.isascii():
+        return _SLUG_RE.sub("-", text).strip("-")
+    return "-".join(filter(None, text.translate(_SLUG_TABLE).split("-")))
+
+
+class TestSlugify:
+    def test_collapses_runs_and_trims(self):
+        assert _slugify("  TAO's -- \"halving\"!!  ") == "tao-s-halving"
+
+    def test_matches_regex_on_ascii(self):
+        for text in ["Test joke about TAO", "a--b", "---", "", "x_y.z", "Miners: 100% up?"]:
+            assert _slugify(text) == _SLUG_RE.sub("-", text.lower()).strip("-")
+
+    def test_non_ascii_falls_back_to_regex(self):
+        assert _slugify("Café über TAO") == "caf-ber-tao"
+
+
 class TestSaveJoke:
     def test_creates_file_with_correct_content(self, tmp_path):
         # Inline the save logic to avoid importing app module
@@ -184,7 +218,7 @@ class TestSaveJoke:
 
         from datetime import datetime, timezone
         ts = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
-        slug = re.sub(r"[^a-z0-9]+", "-", joke[:40].lower()).strip("-")
+        slug = _slugify(joke[:40])
         filename = f"{ts}-{slug}.md"
         content = (
             f"# Roast\n\n"
@@ -208,26 +242,42 @@ class TestSaveJoke:
 # ---------------------------------------------------------------------------
 # Tests for prompt construction
 # ---------------------------------------------------------------------------
+SYSTEM_PROMPT = (
+    "You write short, original roast jokes about the Bittensor (TAO) crypto ecosystem.\n\n"
+    "Each request gives you a comedy style, one example of that style, and a fact.\n\n"
+    "Rules:\n"
+    "- Write ONE new joke in the given style. Just the joke text, nothing else.\n"
+    "- DO NOT copy or paraphrase the example — write something completely new.\n"
+    "- Your joke MUST be original. Do NOT reuse phrases or structure from the example.\n"
+    "- Use the fact as inspiration, but transform it into humor — don't just restate it.\n\n"
+    "/no_think"
+)
+
+
+def _user_prompt(technique: str, example: str, factoid: str) -> str:
+    return (
+        f"Style: {technique}\n"
+        f"Example: {example}\n"
+        f"Fact: {factoid}\n\n"
+        f"Write ONE original roast joke."
+    )
+
+
 class TestPromptConstruction:
     def test_system_prompt_has_anti_copy_instructions(self):
+        assert "DO NOT copy" in SYSTEM_PROMPT
+        assert "MUST be original" in SYSTEM_PROMPT
+        assert "/no_think" in SYSTEM_PROMPT
+
+    def test_system_prompt_is_static(self):
+        """Per-request details stay out of the system prompt so vLLM can prefix-cache it."""
         technique = "Misdirection"
         example = "Some example joke here."
-        system_prompt = (
-            f"You write short, original roast jokes about the Bittensor (TAO) crypto ecosystem.\n\n"
-            f"Your comedy style: {technique}\n\n"
-            f"Here is one example of the style (DO NOT copy or paraphrase this — write something completely new):\n"
-            f"- {example}\n\n"
-            f"Rules:\n"
-            f"- Write ONE new joke. Just the joke text, nothing else.\n"
-            f"- Your joke MUST be original. Do NOT reuse phrases or structure from the example.\n"
-            f"- Use the factoid below as inspiration, but transform it into humor — don't just restate it.\n\n"
-            f"/no_think"
-        )
-        assert "DO NOT copy" in system_prompt
-        assert "MUST be original" in system_prompt
-        assert "/no_think" in system_prompt
-        assert technique in system_prompt
-        assert example in system_prompt
+        user_prompt = _user_prompt(technique, example, "TAO went to zero")
+        assert technique not in SYSTEM_PROMPT
+        assert example not in SYSTEM_PROMPT
+        assert technique in user_prompt
+        assert example in user_prompt
 
     def test_only_one_example_in_prompt(self):
         """Verify we only include 1 example, not 3."""
@@ -235,6 +285,5 @@ class TestPromptConstruction:
         examples = {"Misdirection": ["joke1", "joke2", "joke3", "joke4"]}
         technique = "Misdirection"
         example = random.choice(examples[technique])
-        # The prompt should contain exactly one "- " prefixed example
-        prompt_examples = f"- {example}"
-        assert prompt_examples.count("- ") == 1
+        user_prompt = _user_prompt(technique, example, "TAO went to zero")
+        assert user_prompt.count("Example: ") == 1
@@ -0,0 +1,35 @@
+"""Tests for basilica_login credential storage (no network required)."""
+import json
+
+import pytest
+
+import basilica_login
+
+
+@pytest.fixture
+def auth_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(basilica_login, "AUTH_DIR", tmp_path)
+    monkeypatch.setattr(basilica_login, "AUTH_FILE", tmp_path / "auth.json")
+    monkeypatch.setattr(basilica_login, "_auth_cache", None)
+    return tmp_path / "auth.json"
+
+
+class TestSaveTokens:
+    def test_writes_private_file(self, auth_file):
+        basilica_login.save_tokens({"access_token": "abc", "expires_in": 3600})
+        assert json.loads(auth_file.read_text())["access_token"] == "abc"
+        assert auth_file.stat().st_mode & 0o777 == 0o600
+
+    def test_overwrites_corrupt_file(self, auth_file):
+        auth_file.write_text('{"access_token": "abc", "refr')
+        basilica_login.save_tokens({"access_token": "new", "refresh_token": "r"})
+        data = json.loads(auth_file.read_text())
+        assert data["access_token"] == "new"
+        assert data["refresh_token"] == "r"
+
+    def test_skips_identical_rewrite(self, auth_file):
+        token = {"access_token": "abc", "refresh_token": "r"}
+        basilica_login.save_tokens(dict(token))
+        mtime = auth_file.stat().st_mtime_ns
+        basilica_login.save_tokens(dict(token))
+        assert auth_file.stat().st_mtime_ns == mtime